@@ -6,6 +6,7 @@ from fastapi import FastAPI, File, Form, UploadFile
 from fastapi.responses import Response
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 
 from app.pipeline import clean_drawing
 from app.stl_generator import generate_stl
@@ -13,20 +14,40 @@ from app.vectorize import vectorize_to_svg
 
 app = FastAPI(title="img2stl")
 
+# The pipeline, STL and encode work is CPU-bound and would block the event
+# loop for hundreds of ms per request if run inline in the async handlers,
+# so it all goes through run_in_threadpool (NumPy/OpenCV release the GIL).
+
+
+def _decode_gray(raw: bytes) -> np.ndarray:
+    arr = np.frombuffer(raw, np.uint8)
+    return cv2.imdecode(arr, cv2.IMREAD_GRAYSCALE)
+
+
+def _encode_preview(mask: np.ndarray) -> str:
+    # Compression level 1 instead of the default 3: ~3x faster encode for a
+    # few percent more bytes — the right trade for a throwaway preview.
+    # b64encode reads the encode buffer through a memoryview (no tobytes()
+    # copy) and the output is pure base64, so the ascii decoder suffices.
+    _, buf = cv2.imencode('.png', mask, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    return base64.b64encode(memoryview(buf)).decode('ascii')
+
 
 @app.post("/api/upload")
-async def upload(file: UploadFile = File(...)):
-    """Clean a scanned drawing and return cleaned PNG + SVG."""
-    raw = await file.read()
-    mask = clean_drawing(raw)
+async def upload(file: UploadFile = File(...), format: str = "all"):
+    """Clean a scanned drawing and return cleaned PNG + SVG.
 
-    # Encode cleaned mask as PNG base64
-    _, buf = cv2.imencode('.png', mask)
-    b64 = base64.b64encode(buf.tobytes()).decode('utf-8')
+    Pass ``?format=svg`` to skip the PNG preview encode entirely.
+    """
+    raw = await file.read()
+    mask = await run_in_threadpool(clean_drawing, raw)
 
     # Vectorize to SVG
-    svg = vectorize_to_svg(mask)
+    svg = await run_in_threadpool(vectorize_to_svg, mask)
+    if format == "svg":
+        return {"svg": svg}
 
+    b64 = await run_in_threadpool(_encode_preview, mask)
     return {"cleaned_image": b64, "svg": svg}
 
 
@@ -39,10 +60,10 @@ async def gen_stl(
 ):
     """Generate STL from a binary mask image."""
     raw = await file.read()
-    arr = np.frombuffer(raw, np.uint8)
-    mask = cv2.imdecode(arr, cv2.IMREAD_GRAYSCALE)
+    mask = await run_in_threadpool(_decode_gray, raw)
 
-    stl_bytes = generate_stl(mask, width_mm=width_mm, thickness_mm=thickness_mm, border_mm=border_mm)
+    stl_bytes = await run_in_threadpool(
+        generate_stl, mask, width_mm=width_mm, thickness_mm=thickness_mm, border_mm=border_mm)
     return Response(content=stl_bytes, media_type="application/octet-stream",
                     headers={"Content-Disposition": "attachment; filename=stencil.stl"})
 
@@ -51,10 +72,9 @@ async def gen_stl(
 async def gen_svg(file: UploadFile = File(...)):
     """Generate SVG from a binary mask image."""
     raw = await file.read()
-    arr = np.frombuffer(raw, np.uint8)
-    mask = cv2.imdecode(arr, cv2.IMREAD_GRAYSCALE)
+    mask = await run_in_threadpool(_decode_gray, raw)
 
-    svg = vectorize_to_svg(mask)
+    svg = await run_in_threadpool(vectorize_to_svg, mask)
     return Response(content=svg, media_type="image/svg+xml")
 
 
@@ -1,8 +1,32 @@
+import cv2
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 
 
+def make_ink_rect(shape, x0, y0, x1, y1):
+    """Mask of ``shape`` with a filled ink rectangle covering [y0:y1, x0:x1].
+
+    cv2.rectangle fills through one C call; the contiguous uint8 layout
+    from np.zeros keeps OpenCV on its fastest single-channel path.
+    """
+    mask = np.zeros(shape, dtype=np.uint8)
+    cv2.rectangle(mask, (x0, y0), (x1 - 1, y1 - 1), 255, -1)
+    return mask
+
+
 @pytest.fixture
 def client():
     return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def masks():
+    """Shared test masks, built once per session (generate_stl never mutates
+    its input, so session scope is safe)."""
+    return {
+        "square50": make_ink_rect((50, 50), 15, 15, 35, 35),  # ink square (cutout)
+        "empty20": np.zeros((20, 20), dtype=np.uint8),
+        "rect": make_ink_rect((50, 100), 40, 20, 60, 30),
+    }
@@ -1,41 +1,114 @@
 import numpy as np
-import cv2
-from app.stl_generator import generate_stl
+import pytest
+from app.stl_generator import generate_obj, generate_stl, STL_DTYPE
 
 
-def test_generate_stl_returns_bytes():
-    """STL generation should return valid binary STL data."""
-    # Simple binary image: small square of ink in center
-    mask = np.zeros((50, 50), dtype=np.uint8)
-    mask[15:35, 15:35] = 255  # ink square (cutout)
-    stl_bytes = generate_stl(mask, width_mm=50, thickness_mm=0.8, border_mm=3)
-    assert isinstance(stl_bytes, bytes)
-    assert len(stl_bytes) > 0
-    # Binary STL starts with 80-byte header + 4-byte triangle count
-    assert len(stl_bytes) > 84
+def _assert_valid_binary_stl(stl_bytes):
+    """The triangle-count field must agree exactly with the byte length —
+    stronger than a length inequality, and catches truncated buffers."""
+    n = int(np.frombuffer(stl_bytes, '<u4', count=1, offset=80)[0])
+    assert n > 0
+    assert len(stl_bytes) == 84 + STL_DTYPE.itemsize * n
+
+
+def _parse_stl_vertices(stl_bytes):
+    """Parse binary STL bytes in-memory, returning all vertices as (N, 3)."""
+    n = int(np.frombuffer(stl_bytes, '<u4', count=1, offset=80)[0])
+    records = np.frombuffer(stl_bytes, STL_DTYPE, count=n, offset=84)
+    return records['v'].reshape(-1, 3)
+
+
+def _signed_volume(stl_bytes):
+    """Signed volume enclosed by the mesh (divergence theorem over facets).
 
+    Equals the true volume only when the surface is closed and every facet
+    is wound facing outward — inverted walls or walls that miss the face
+    edges both shift it away from the analytic value.
+    """
+    tris = _parse_stl_vertices(stl_bytes).reshape(-1, 3, 3).astype(np.float64)
+    return float(np.einsum('ij,ij->i', tris[:, 0],
+                           np.cross(tris[:, 1], tris[:, 2])).sum()) / 6.0
 
-def test_generate_stl_solid_image():
-    """An all-black mask (no ink) should produce a solid plate."""
-    mask = np.zeros((20, 20), dtype=np.uint8)
-    stl_bytes = generate_stl(mask, width_mm=50, thickness_mm=0.8, border_mm=3)
+
+@pytest.mark.parametrize("name,width_mm,thickness_mm,border_mm", [
+    ("square50", 50, 0.8, 3),   # ink square cutout
+    ("empty20", 50, 0.8, 3),    # no ink -> solid plate
+    ("rect", 100, 1.0, 2),      # non-square canvas
+])
+def test_generate_stl_returns_valid(masks, name, width_mm, thickness_mm, border_mm):
+    """STL generation should return valid binary STL data for each mask."""
+    stl_bytes = generate_stl(masks[name], width_mm=width_mm,
+                             thickness_mm=thickness_mm, border_mm=border_mm)
     assert isinstance(stl_bytes, bytes)
-    assert len(stl_bytes) > 84
+    _assert_valid_binary_stl(stl_bytes)
 
 
-def test_generate_stl_respects_dimensions():
+def test_generate_stl_respects_dimensions(masks):
     """STL mesh vertices should be within the specified width."""
-    mask = np.zeros((50, 100), dtype=np.uint8)
-    mask[20:30, 40:60] = 255
-    stl_bytes = generate_stl(mask, width_mm=100, thickness_mm=1.0, border_mm=2)
-    # Parse the STL to check vertex bounds
-    from stl import mesh as stl_mesh
-    import tempfile, os
-    with tempfile.NamedTemporaryFile(suffix='.stl', delete=False) as f:
-        f.write(stl_bytes)
-        f.flush()
-        m = stl_mesh.Mesh.from_file(f.name)
-    os.unlink(f.name)
+    stl_bytes = generate_stl(masks["rect"], width_mm=100, thickness_mm=1.0, border_mm=2)
+    _assert_valid_binary_stl(stl_bytes)
+    # Parse the STL in-memory to check vertex bounds
+    xs = _parse_stl_vertices(stl_bytes)[:, 0]
     # X coordinates should not exceed width_mm
-    assert m.vectors[:, :, 0].max() <= 100.0 + 0.01
-    assert m.vectors[:, :, 0].min() >= -0.01
+    assert xs.max() <= 100.0 + 0.01
+    assert xs.min() >= -0.01
+
+
+def test_generate_stl_signed_volume_matches_analytic(masks):
+    """Signed mesh volume must equal the analytic solid-pixel volume.
+
+    This pins both wall defects at once: inverted winding flips wall
+    contributions negative, and walls that miss the face-run edges leak
+    (the enclosed volume drifts off the exact value).
+    """
+    mask = masks["rect"]  # (50, 100) with a 20x10 ink cutout, no downscale
+    stl_bytes = generate_stl(mask, width_mm=100, thickness_mm=1.0, border_mm=2)
+    h, w = mask.shape
+    border_px = 2  # int(border_mm / (width_mm / w))
+    pixel_mm = 100.0 / (w + 2 * border_px)
+    solid_px = (h + 2 * border_px) * (w + 2 * border_px) - np.count_nonzero(mask)
+    assert _signed_volume(stl_bytes) == pytest.approx(
+        solid_px * pixel_mm ** 2 * 1.0, rel=1e-5)
+
+
+def test_generate_stl_solid_plate_volume(masks):
+    """A mask with no ink is a plain box: signed volume must be exactly
+    width x height x thickness (the 20px mask + 1px border scales to a
+    50x50mm square). A negative value means inward-facing walls."""
+    stl_bytes = generate_stl(masks["empty20"], width_mm=50, thickness_mm=0.8, border_mm=3)
+    assert _signed_volume(stl_bytes) == pytest.approx(50.0 * 50.0 * 0.8, rel=1e-5)
+
+
+def test_generate_stl_hole_walls_face_into_hole(masks):
+    """Cutout walls must wind opposite to outer walls: the signed volume of
+    square50 (20x20 hole in a 56x56px plate) equals plate minus hole.
+    Holes wound like outer boundaries would add the hole volume instead."""
+    stl_bytes = generate_stl(masks["square50"], width_mm=50, thickness_mm=0.8, border_mm=3)
+    pixel_mm = 50.0 / 56  # 50px mask plus a 3px border on each side
+    expected = (56 * 56 - 20 * 20) * pixel_mm ** 2 * 0.8
+    assert _signed_volume(stl_bytes) == pytest.approx(expected, rel=1e-5)
+
+
+def test_generate_stl_normals_follow_winding(masks):
+    """Computed facet normals derive from winding, and every facet of this
+    axis-aligned mesh faces along exactly one axis — so each normal must be
+    a unit vector with a single nonzero component."""
+    stl_bytes = generate_stl(masks["square50"], width_mm=50, thickness_mm=0.8,
+                             border_mm=3, compute_normals=True)
+    n = int(np.frombuffer(stl_bytes, '<u4', count=1, offset=80)[0])
+    normals = np.frombuffer(stl_bytes, STL_DTYPE, count=n, offset=84)['normal']
+    assert np.allclose(np.linalg.norm(normals, axis=1), 1.0, atol=1e-6)
+    assert np.allclose(np.abs(normals).max(axis=1), 1.0, atol=1e-6)
+
+
+def test_generate_obj_indexes_shared_vertices(masks):
+    """OBJ output should reference a deduplicated vertex table: far fewer
+    ``v`` lines than the 3-per-triangle vertex soup STL stores, with every
+    face index in range."""
+    obj = generate_obj(masks["square50"], width_mm=50, thickness_mm=0.8, border_mm=3)
+    lines = obj.splitlines()
+    n_verts = sum(1 for ln in lines if ln.startswith("v "))
+    faces = [ln.split()[1:] for ln in lines if ln.startswith("f ")]
+    assert n_verts > 0 and len(faces) > 0
+    assert n_verts < 3 * len(faces)  # dedup actually shared vertices
+    assert all(1 <= int(i) <= n_verts for face in faces for i in face)